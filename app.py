@@ -1,18 +1,31 @@
 # app.py
 import streamlit as st
 import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 import sqlite3
 from datetime import datetime, timezone, timedelta
-import altair as alt
 import os
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 from dateutil import parser as _dt_parser
 import random
-from statistics import mean
+import time
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+
+# orjson is optional; it decodes the /data payload much faster than stdlib json
+try:
+    import orjson
+except Exception:
+    orjson = None
 
 # import the globe renderer
 from globe_widget import render_globe
+# GeoIP helpers/cache shared with globe_component
+from geoip import GEOIP_DB, is_ipv4, fetch_ipapi, open_geoip_db, load_cached, save_cached
 
 # Load local .env for dev
 load_dotenv()
@@ -24,6 +37,7 @@ DEFAULT_DB = os.path.join("data", "metrics.db")
 DEFAULT_CSV = os.path.join("data", "probes.csv")
 LATENCY_ALERT_MS = 200
 PACKET_LOSS_ALERT_PCT = 20.0
+CHART_MAX_POINTS = 2000  # per host; beyond this the chart is downsampled
 
 PROBE_API_BASE = os.getenv("PROBE_API_BASE", "https://web-production-d9ba8.up.railway.app")
 RUN_API_KEY = os.getenv("RUN_API_KEY", "JSGsRfSFXYXjoDiTLqJC-EKMZjRi45AH5C5ZVSOQaGg")
@@ -34,8 +48,8 @@ st.title("🌐 Real-Time Cloud Network Performance Dashboard")
 st.sidebar.header("Data & Filters")
 
 db_path = st.sidebar.text_input("SQLite DB path", DEFAULT_DB)
-use_csv = st.sidebar.checkbox("Use CSV instead of DB (if checked, CSV path is used)", False)
-csv_path = st.sidebar.text_input("CSV path", DEFAULT_CSV)
+use_csv = st.sidebar.checkbox("Use CSV/Parquet instead of DB (if checked, file path is used)", False)
+csv_path = st.sidebar.text_input("CSV or .parquet path", DEFAULT_CSV)
 hours = st.sidebar.slider("Hours to show", min_value=1, max_value=168, value=24)
 
 st.sidebar.markdown("---")
@@ -46,19 +60,62 @@ st.sidebar.metric("Packet loss alert (%)", PACKET_LOSS_ALERT_PCT)
 # -----------------------------
 # Data loader
 # -----------------------------
+# only the columns the dashboard reads; keeps rows narrow when loading from SQLite
+PROBE_COLUMNS = ["timestamp", "host", "avg_ms", "packet_loss_pct", "received", "method", "http_status"]
+# low-cardinality text columns; categorical makes groupby/isin work on integer codes
+CATEGORY_COLUMNS = ["host", "method", "protocol"]
+
+def compact_dtypes(df):
+    cols = {c: "category" for c in CATEGORY_COLUMNS if c in df.columns}
+    return df.astype(cols) if cols else df
+
+@st.cache_resource
+def get_conn(path):
+    """One long-lived read connection per DB path, shared across reruns and sessions."""
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA mmap_size=268435456")
+    conn.execute("PRAGMA cache_size=-65536")
+    # DBs created by older probe.py versions lack the window index
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_probes_ts_host ON probes(timestamp, host)")
+    return conn
+
+@st.cache_resource
+def _api_validators():
+    """Last ETag/Last-Modified seen from /data and the frame they validate (shared across sessions)."""
+    return {}
+
 @st.cache_data(ttl=10)
-def load_data(limit=5000, use_csv_local=False, csv_path_local=None, db_path_local=None):
+def load_cloud_data(limit=5000):
+    """Fetch from the probe API; None when it is unreachable so callers fall back to local data."""
     try:
         url = f"{PROBE_API_BASE}/data?limit={limit}"
         headers = {}
         if RUN_API_KEY:
             headers["X-API-KEY"] = RUN_API_KEY
+        cached = _api_validators().get(url)
+        if cached:
+            # conditional GET: an unchanged dataset comes back as an empty 304
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
         resp = requests.get(url, headers=headers, timeout=6)
+        if resp.status_code == 304 and cached:
+            return cached["df"]
         resp.raise_for_status()
-        payload = resp.json().get("data", [])
-        if not payload:
+        body = orjson.loads(resp.content) if orjson else resp.json()
+        if isinstance(body.get("columns"), dict):
+            # column-format response: build the frame directly, no per-record normalisation
+            df = pd.DataFrame(body["columns"])
+        else:
+            payload = body.get("data", [])
+            if not payload:
+                return pd.DataFrame()
+            df = pd.json_normalize(payload)
+        if df.empty:
             return pd.DataFrame()
-        df = pd.json_normalize(payload)
 
         # Normalize names
         if "ts" in df.columns: df.rename(columns={"ts": "timestamp"}, inplace=True)
@@ -68,23 +125,74 @@ def load_data(limit=5000, use_csv_local=False, csv_path_local=None, db_path_loca
         if "timestamp" in df.columns:
             df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True, errors="coerce")
 
+        df = compact_dtypes(df)
+        if resp.headers.get("ETag") or resp.headers.get("Last-Modified"):
+            _api_validators()[url] = {"etag": resp.headers.get("ETag"),
+                                      "last_modified": resp.headers.get("Last-Modified"), "df": df}
         return df
     except Exception:
-        # fallback to local
-        try:
-            if use_csv_local and csv_path_local and os.path.exists(csv_path_local):
-                return pd.read_csv(csv_path_local, parse_dates=["timestamp"])
-            if db_path_local and os.path.exists(db_path_local):
-                conn = sqlite3.connect(db_path_local)
-                df = pd.read_sql("SELECT * FROM probes ORDER BY timestamp ASC", conn, parse_dates=["timestamp"])
-                conn.close()
-                return df
-        except Exception:
-            pass
+        return None
+
+def source_mtime_ns(path):
+    """Change marker for a local source; includes the SQLite WAL file, which takes writes before checkpoints."""
+    stamps = [os.stat(p).st_mtime_ns for p in (path, path + "-wal") if p and os.path.exists(p)]
+    return max(stamps) if stamps else None
+
+def read_parquet_window(path, since):
+    """Read the PROBE_COLUMNS the file has, letting pyarrow skip row groups older than since."""
+    # the filter literal has to match how the file stores timestamps: tz-aware, naive or ISO text
+    schema = pq.read_schema(path)
+    ts_type = schema.field("timestamp").type if "timestamp" in schema.names else None
+    if ts_type is not None and pa.types.is_timestamp(ts_type):
+        bound = since if ts_type.tz else since.tz_localize(None)
+    elif ts_type is not None and (pa.types.is_string(ts_type) or pa.types.is_large_string(ts_type)):
+        bound = since.strftime("%Y-%m-%dT%H:%M:%S")
+    else:
+        bound = None  # no usable timestamp column to push the window into
+    filters = [("timestamp", ">=", bound)] if bound is not None else None
+    # optional columns may be absent (like the CSV path's usecols filter)
+    columns = [c for c in PROBE_COLUMNS if c in schema.names]
+    return pd.read_parquet(path, columns=columns, filters=filters)
+
+def local_source_is_file(use_csv_local, csv_path_local):
+    """True when load_local_data reads the CSV/Parquet file, False when it falls back to the DB."""
+    return bool(use_csv_local and csv_path_local and os.path.exists(csv_path_local))
+
+# no ttl: mtime_ns changes on every probe write, so a few entries are enough and old windows get evicted
+@st.cache_data(max_entries=4)
+def load_local_data(use_csv_local=False, csv_path_local=None, db_path_local=None, hours_local=24, mtime_ns=None):
+    """Read the local CSV/Parquet/SQLite source. mtime_ns is only a cache key: reload on change."""
+    try:
+        if local_source_is_file(use_csv_local, csv_path_local):
+            if csv_path_local.endswith(".parquet"):
+                # typed + columnar: only the needed columns are decoded
+                df = read_parquet_window(csv_path_local, pd.Timestamp.now(tz="UTC") - pd.Timedelta(hours=hours_local))
+                df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True, errors="coerce")
+                return compact_dtypes(df)
+            return compact_dtypes(pd.read_csv(csv_path_local, usecols=lambda c: c in PROBE_COLUMNS,
+                                              parse_dates=["timestamp"]))
+        if db_path_local and os.path.exists(db_path_local):
+            # push the time window into SQL; timestamps are stored as ISO-8601 UTC text,
+            # so a second-resolution prefix compares correctly as a string
+            since = (datetime.now(timezone.utc) - timedelta(hours=hours_local)).strftime("%Y-%m-%dT%H:%M:%S")
+            df = pd.read_sql(f"SELECT {', '.join(PROBE_COLUMNS)} FROM probes WHERE timestamp >= ? ORDER BY timestamp ASC",
+                             get_conn(db_path_local), params=(since,), parse_dates=["timestamp"])
+            return compact_dtypes(df)
+    except Exception:
+        pass
     return pd.DataFrame()
 
+def load_data(limit=5000, use_csv_local=False, csv_path_local=None, db_path_local=None, hours_local=24):
+    df = load_cloud_data(limit)
+    if df is not None:
+        return df
+    # fallback to local
+    # key on the source that will actually be read ("Use CSV" with a missing file reads the DB)
+    mtime_ns = source_mtime_ns(csv_path_local if local_source_is_file(use_csv_local, csv_path_local) else db_path_local)
+    return load_local_data(use_csv_local, csv_path_local, db_path_local, hours_local, mtime_ns)
+
 # load
-df = load_data(use_csv_local=use_csv, csv_path_local=csv_path, db_path_local=db_path)
+df = load_data(use_csv_local=use_csv, csv_path_local=csv_path, db_path_local=db_path, hours_local=hours)
 
 # If still empty, show message but continue (globe can still render)
 if df.empty:
@@ -96,30 +204,28 @@ if "timestamp" not in df.columns:
     st.error("Loaded data missing 'timestamp' column.")
     st.stop()
 
-df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True, errors="coerce")
+# loaders already return tz-aware timestamps; only parse when a source didn't
+if not isinstance(df["timestamp"].dtype, pd.DatetimeTZDtype):
+    df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True, errors="coerce")
 now = datetime.now(timezone.utc)
 start_time = now - timedelta(hours=hours)
-df = df[df["timestamp"] >= start_time]
+if df["timestamp"].is_monotonic_increasing:
+    # SQLite rows arrive sorted: binary-search the window start instead of masking every row
+    df = df.iloc[df["timestamp"].searchsorted(start_time):]
+else:
+    df = df[df["timestamp"] >= start_time]
 
 # Build host_stats
 host_stats = {}
 if not df.empty:
-    grouped = df.groupby("host")
-    for host, g in grouped:
-        lat_list = g.get("avg_ms", pd.Series([], dtype=float)).dropna().astype(float).tolist()
-        loss_series = g.get("packet_loss_pct")
-        loss_list = []
-        if loss_series is not None:
-            try:
-                loss_list = loss_series.dropna().astype(float).tolist()
-            except Exception:
-                loss_list = []
-        host_stats[host] = {
-            "avg_latency": mean(lat_list) if lat_list else None,
-            "latest_loss": (loss_list[-1] if loss_list else None),
-            "count": len(g),
-            "last_ts": (g["timestamp"].max() if "timestamp" in g else None)
-        }
+    agg_spec = {"count": ("timestamp", "size"), "last_ts": ("timestamp", "max")}
+    if "avg_ms" in df.columns:
+        agg_spec["avg_latency"] = ("avg_ms", "mean")
+    stats_df = df.groupby("host", sort=False, observed=True).agg(**agg_spec)
+    if "packet_loss_pct" in df.columns:
+        # last non-null loss sample per host, in time order
+        stats_df["latest_loss"] = df.sort_values("timestamp").groupby("host", sort=False, observed=True)["packet_loss_pct"].last()
+    host_stats = stats_df.astype(object).where(stats_df.notna(), None).to_dict(orient="index")
 
 # Manual geolocation mapping (add known hosts here)
 HOST_COORDS = {
@@ -130,60 +236,99 @@ HOST_COORDS = {
     "www.yahoo.com": {"lat": 37.7749, "lng": -122.4194},
 }
 
+@st.cache_resource
+def get_http_session():
+    """Shared keep-alive session for GeoIP lookups and on-demand probes."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=32)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
 # GeoIP helper (best-effort; used only for IP-like hosts)
-_geoip_cache = {}
-def try_geoip_lookup(host):
-    if host in _geoip_cache:
-        return _geoip_cache[host]
-    import re, time
-    if re.match(r"^\d+\.\d+\.\d+\.\d+$", host):
-        try:
-            r = requests.get(f"https://ipapi.co/{host}/json/", timeout=3)
-            j = r.json()
-            lat = j.get("latitude") or j.get("lat")
-            lng = j.get("longitude") or j.get("lon")
-            if lat and lng:
-                coords = {"lat": float(lat), "lng": float(lng)}
-                _geoip_cache[host] = coords
-                time.sleep(0.05)
-                return coords
-        except Exception:
-            pass
-    _geoip_cache[host] = None
-    return None
+GEOIP_MAX_WORKERS = 4  # concurrent ipapi.co calls; more just trips its rate limit
+# Results persist in a small SQLite cache so reruns and restarts skip the HTTP round trips.
+@st.cache_resource
+def get_geoip_db(path=GEOIP_DB):
+    conn = open_geoip_db(path, check_same_thread=False)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+def lookup_coords(hosts):
+    """Return {host: coords or None} for IP-like hosts, from the disk cache or concurrent GeoIP calls.
+
+    Hosts whose lookup failed are left out (and uncached) so a later rerun retries them.
+    """
+    hosts = [h for h in hosts if is_ipv4(h)]
+    if not hosts:
+        return {}
+    conn = get_geoip_db()
+    found = load_cached(conn, hosts)
+    missing = [h for h in hosts if h not in found]
+    if missing:
+        session = get_http_session()
+        with ThreadPoolExecutor(max_workers=min(GEOIP_MAX_WORKERS, len(missing))) as ex:
+            results = dict(zip(missing, ex.map(lambda h: fetch_ipapi(session, h), missing)))
+        answered = {h: coords for h, (ok, coords) in results.items() if ok}
+        save_cached(conn, answered)
+        found.update(answered)
+    return found
 
 # Build globe nodes + arcs (runner at default SF unless env set)
 RUNNER_LAT = float(os.getenv("RUNNER_LAT", "37.7749"))
 RUNNER_LNG = float(os.getenv("RUNNER_LNG", "-122.4194"))
 
-nodes = []
-arcs = []
-# add runner node (center/origin)
-nodes.append({"lat": RUNNER_LAT, "lng": RUNNER_LNG, "size": 1.6, "color": "cyan", "label": "probe-runner"})
-
-for host, stats in host_stats.items():
-    coords = HOST_COORDS.get(host)
-    if coords is None:
-        coords = try_geoip_lookup(host)
-    if coords is None:
-        coords = {"lat": (random.random() - 0.5) * 180, "lng": (random.random() - 0.5) * 360}
-    size = 0.5 + min(2.0, 0.02 * (stats.get("count", 1)))
-    color = "orange" if stats.get("avg_latency") and stats["avg_latency"] > 300 else ("lime" if stats.get("avg_latency") and stats["avg_latency"] < 50 else "white")
-    nodes.append({
-        "lat": float(coords["lat"]),
-        "lng": float(coords["lng"]),
-        "size": size,
-        "color": color,
-        "label": host,
-        "avg_latency": stats.get("avg_latency"),
-        "count": stats.get("count")
-    })
-    arcs.append({
-        "startLat": RUNNER_LAT, "startLng": RUNNER_LNG,
-        "endLat": float(coords["lat"]), "endLng": float(coords["lng"]),
-        "color": "rgba(0,200,255,0.6)",
-        "altitude": 0.04 + (stats.get("avg_latency") or 0)/5000.0
-    })
+GLOBE_COUNT_CAP = 100  # node size saturates at 0.5 + 0.02 * 100
+# globe draws the GLOBE_TOP_K slowest plus the GLOBE_TOP_K most recent hosts (one draw call per arc)
+GLOBE_TOP_K = int(os.getenv("GLOBE_TOP_K", "50"))
+
+def globe_hosts(stats, k=GLOBE_TOP_K):
+    """Union of the k worst-latency and k most recently seen hosts in host_stats."""
+    if len(stats) <= k:
+        return set(stats)
+    def by(field):
+        # hosts missing the field rank last
+        return lambda h: (stats[h].get(field) is not None, stats[h].get(field) or 0)
+    return set(heapq.nlargest(k, stats, key=by("avg_latency"))) | set(heapq.nlargest(k, stats, key=by("last_ts")))
+
+@st.cache_data(ttl=60)
+def build_globe_payload(host_key):
+    """Globe nodes/arcs from a canonical ((host, avg_latency_ms, count), ...) tuple; cached per distinct input."""
+    geo_coords = lookup_coords([h for h, _, _ in host_key if h not in HOST_COORDS])
+    coords_list = []
+    for host, _, _ in host_key:
+        coords = HOST_COORDS.get(host) or geo_coords.get(host)
+        if coords is None:
+            coords = {"lat": (random.random() - 0.5) * 180, "lng": (random.random() - 0.5) * 360}
+        coords_list.append(coords)
+
+    # per-host attributes as arrays; dicts are only built once, at the end
+    n = len(host_key)
+    lats = np.fromiter((c["lat"] for c in coords_list), dtype=float, count=n)
+    lngs = np.fromiter((c["lng"] for c in coords_list), dtype=float, count=n)
+    latency = np.fromiter((np.nan if a is None else a for _, a, _ in host_key), dtype=float, count=n)
+    counts = np.fromiter((c for _, _, c in host_key), dtype=float, count=n)
+    sizes = 0.5 + np.minimum(2.0, 0.02 * counts)
+    altitudes = 0.04 + np.nan_to_num(latency) / 5000.0
+    colors = np.where(latency > 300, "orange", np.where(latency < 50, "lime", "white"))
+
+    # runner node first (center/origin)
+    nodes = [{"lat": RUNNER_LAT, "lng": RUNNER_LNG, "size": 1.6, "color": "cyan", "label": "probe-runner"}]
+    nodes += [{"lat": la, "lng": ln, "size": sz, "color": col, "label": host, "avg_latency": avg, "count": cnt}
+              for la, ln, sz, col, (host, avg, cnt) in zip(lats.tolist(), lngs.tolist(), sizes.tolist(), colors.tolist(), host_key)]
+    arcs = [{"startLat": RUNNER_LAT, "startLng": RUNNER_LNG, "endLat": la, "endLng": ln,
+             "color": "rgba(0,200,255,0.6)", "altitude": alt}
+            for la, ln, alt in zip(lats.tolist(), lngs.tolist(), altitudes.tolist())]
+    return nodes, arcs
+
+# whole-ms latency and capped count make no visible difference but let cosmetic reruns hit the cache
+globe_shown = globe_hosts(host_stats)
+globe_key = tuple(sorted(
+    (str(host), int(round(stats["avg_latency"])) if stats.get("avg_latency") is not None else None,
+     min(int(stats.get("count") or 1), GLOBE_COUNT_CAP))
+    for host, stats in host_stats.items() if host in globe_shown
+))
+nodes, arcs = build_globe_payload(globe_key)
 
 # Render the globe (imported helper)
 render_globe(nodes=nodes, arcs=arcs, opacity=0.95, auto_rotate_speed=12, show_graticules=True, height=700)
@@ -204,22 +349,28 @@ if filtered.empty:
 
 # Uptime & latest metrics
 st.markdown("## Uptime & Latest metrics")
+# per-host totals, up counts and latest row in one pass, then plain dict lookups below
+if "packet_loss_pct" in filtered.columns:
+    up_mask = filtered["packet_loss_pct"] < 100
+else:
+    up_mask = filtered.get("avg_ms", pd.Series(index=filtered.index, dtype=float)).notna()
+totals = filtered.groupby("host", sort=False, observed=True).size().to_dict()
+ups = up_mask.groupby(filtered["host"], sort=False, observed=True).sum().to_dict()
+latest = (filtered.sort_values("timestamp").groupby("host", sort=False, observed=True).tail(1)
+          .set_index("host").to_dict(orient="index"))
+
 cols = st.columns(len(hosts_selected))
 for i, host in enumerate(hosts_selected):
-    sub = filtered[filtered["host"] == host]
-    total = len(sub)
+    total = totals.get(host, 0)
     if total == 0:
         uptime_pct = 0.0
         latency_display = "n/a"
         loss_display = "n/a"
         method_or_proto = "n/a"
     else:
-        if "packet_loss_pct" in sub.columns:
-            up = len(sub[sub["packet_loss_pct"] < 100])
-        else:
-            up = len(sub[pd.notnull(sub.get("avg_ms"))])
+        up = ups.get(host, 0)
         uptime_pct = (up / total * 100.0) if total > 0 else 0.0
-        last = sub.sort_values("timestamp").iloc[-1]
+        last = latest[host]
         latency_display = f"{last['avg_ms']:.1f} ms" if pd.notnull(last.get("avg_ms")) else "n/a"
         method_or_proto = last.get("protocol") or last.get("method") or "n/a"
         loss_val = last.get("packet_loss_pct") if "packet_loss_pct" in last else (last.get("loss_pct") if "loss_pct" in last else None)
@@ -229,52 +380,103 @@ for i, host in enumerate(hosts_selected):
         st.metric(label=f"{host} uptime % (last {hours}h)", value=f"{uptime_pct:.1f}%")
         st.write(f"Last: {method_or_proto} | Latency: {latency_display} | Loss: {loss_display}")
 
-# Charts (defensive: dropna on field that exists)
+def downsample_minmax(frame, value_cols, n_out=CHART_MAX_POINTS):
+    """Per host, keep the min and max sample of each bucket (for every value column) so spikes survive."""
+    frame = frame.sort_values("timestamp")
+    # each bucket keeps up to 2 rows per value column; size the buckets so a host stays within n_out
+    n_buckets = max(1, n_out // (2 * max(1, len(value_cols))))
+    keep = []
+    for _, g in frame.groupby("host", sort=False, observed=True):
+        n = len(g)
+        if n <= n_out:
+            keep.append(g.index.to_numpy())
+            continue
+        buckets = np.arange(n) * n_buckets // n
+        for col in value_cols:
+            present = g[col].notna().to_numpy()
+            by_bucket = g[col][present].groupby(buckets[present])
+            keep.append(by_bucket.idxmin().to_numpy())
+            keep.append(by_bucket.idxmax().to_numpy())
+    if not keep:
+        return frame
+    return frame.loc[np.unique(np.concatenate(keep))].sort_values("timestamp")
+
+CHART_COLUMNS = ["timestamp", "host", "avg_ms", "packet_loss_pct"]
+
+# Plain Vega-Lite views (skips Altair's per-rerun schema validation); the
+# interval param bound to scales is what Altair's .interactive() emits.
+# Both views are stacked in one vconcat spec so the data is sent and parsed once.
+LAT_VIEW = {
+    "mark": "line",
+    "transform": [{"filter": "isValid(datum.avg_ms)"}],
+    "encoding": {
+        "x": {"field": "timestamp", "type": "temporal", "title": "Time (UTC)"},
+        "y": {"field": "avg_ms", "type": "quantitative", "title": "Avg latency (ms)"},
+        "color": {"field": "host", "type": "nominal"},
+        "tooltip": [{"field": "timestamp", "type": "temporal"}, {"field": "host", "type": "nominal"},
+                    {"field": "avg_ms", "type": "quantitative"}, {"field": "packet_loss_pct", "type": "quantitative"}],
+    },
+    "params": [{"name": "lat_grid", "select": "interval", "bind": "scales"}],
+    "width": "container",
+    "height": 300,
+}
+LOSS_VIEW = {
+    "mark": "line",
+    "transform": [{"filter": "isValid(datum.packet_loss_pct)"}],
+    "encoding": {
+        "x": {"field": "timestamp", "type": "temporal", "title": "Time (UTC)"},
+        "y": {"field": "packet_loss_pct", "type": "quantitative", "title": "Packet loss (%)"},
+        "color": {"field": "host", "type": "nominal"},
+        "tooltip": [{"field": "timestamp", "type": "temporal"}, {"field": "host", "type": "nominal"},
+                    {"field": "packet_loss_pct", "type": "quantitative"}, {"field": "avg_ms", "type": "quantitative"}],
+    },
+    "params": [{"name": "loss_grid", "select": "interval", "bind": "scales"}],
+    "width": "container",
+    "height": 300,
+}
+
+# Charts (defensive: only views whose field exists and has data)
 st.markdown("---")
 st.markdown("## Time series")
 
-if "avg_ms" in filtered.columns:
-    tmp = filtered.dropna(subset=["avg_ms"])
-    if not tmp.empty:
-        lat_chart = (
-            alt.Chart(tmp)
-            .mark_line()
-            .encode(x=alt.X("timestamp:T", title="Time (UTC)"),
-                    y=alt.Y("avg_ms:Q", title="Avg latency (ms)"),
-                    color="host:N",
-                    tooltip=["timestamp:T", "host:N", "avg_ms:Q", "packet_loss_pct:Q"])
-            .interactive()
-            .properties(height=300)
-        )
-        st.altair_chart(lat_chart, use_container_width=True)
+# Streamlit sends chart data as a columnar Arrow table; ship only the fields the specs use.
+chart_df = filtered[[c for c in CHART_COLUMNS if c in filtered.columns]]
 
-if "packet_loss_pct" in filtered.columns:
-    tmp2 = filtered.dropna(subset=["packet_loss_pct"])
-    if not tmp2.empty:
-        loss_chart = (
-            alt.Chart(tmp2)
-            .mark_line()
-            .encode(x=alt.X("timestamp:T", title="Time (UTC)"),
-                    y=alt.Y("packet_loss_pct:Q", title="Packet loss (%)"),
-                    color="host:N",
-                    tooltip=["timestamp:T", "host:N", "packet_loss_pct:Q", "avg_ms:Q"])
-            .interactive()
-            .properties(height=300)
-        )
-        st.altair_chart(loss_chart, use_container_width=True)
+views, value_cols = [], []
+for col, view in (("avg_ms", LAT_VIEW), ("packet_loss_pct", LOSS_VIEW)):
+    if col in chart_df.columns and chart_df[col].notna().any():
+        views.append(view)
+        value_cols.append(col)
+if views:
+    ts_data = downsample_minmax(chart_df.dropna(subset=value_cols, how="all"), value_cols)
+    st.vega_lite_chart(ts_data, {"vconcat": views}, use_container_width=True)
 
 # Alerts
 st.markdown("---")
 st.markdown("## Alerts (detected)")
+# one mask per rule (same rules as probe.check_alerts); rules with an all-null input column are skipped
+has_lat = "avg_ms" in filtered.columns and filtered["avg_ms"].notna().any()
+has_loss = "packet_loss_pct" in filtered.columns and filtered["packet_loss_pct"].notna().any()
+has_reach = ("received" in filtered.columns and "http_status" in filtered.columns
+             and filtered["received"].notna().any())
 alerts = []
-for _, row in filtered.iterrows():
-    if pd.notnull(row.get("avg_ms")) and row["avg_ms"] > LATENCY_ALERT_MS:
-        alerts.append({"timestamp": row["timestamp"], "host": row["host"], "msg": f"High latency > {LATENCY_ALERT_MS} ms", "value": row["avg_ms"]})
-    if pd.notnull(row.get("packet_loss_pct")) and row["packet_loss_pct"] >= PACKET_LOSS_ALERT_PCT:
-        alerts.append({"timestamp": row["timestamp"], "host": row["host"], "msg": f"High packet loss >= {PACKET_LOSS_ALERT_PCT}%", "value": row["packet_loss_pct"]})
+if has_lat:
+    lat_mask = filtered["avg_ms"].gt(LATENCY_ALERT_MS)
+    alerts.append(filtered.loc[lat_mask, ["timestamp", "host", "avg_ms"]].rename(columns={"avg_ms": "value"})
+                  .assign(metric="latency_ms", msg=f"High latency > {LATENCY_ALERT_MS} ms"))
+if has_loss:
+    loss_mask = filtered["packet_loss_pct"].ge(PACKET_LOSS_ALERT_PCT)
+    alerts.append(filtered.loc[loss_mask, ["timestamp", "host", "packet_loss_pct"]].rename(columns={"packet_loss_pct": "value"})
+                  .assign(metric="packet_loss_pct", msg=f"High packet loss >= {PACKET_LOSS_ALERT_PCT}%"))
+if has_reach:
+    unreach_mask = filtered["received"].eq(0) & filtered["http_status"].isna()
+    alerts.append(filtered.loc[unreach_mask, ["timestamp", "host"]]
+                  .assign(value=1.0, metric="unreachable", msg="No responses from host"))
+alerts = [a for a in alerts if not a.empty]
 
 if alerts:
-    st.dataframe(pd.DataFrame(alerts).sort_values("timestamp", ascending=False))
+    alerts_df = pd.concat(alerts, ignore_index=True)[["timestamp", "host", "metric", "msg", "value"]]
+    st.dataframe(alerts_df.sort_values("timestamp", ascending=False))
 else:
     st.info("No alerts in selected timeframe.")
 
@@ -288,9 +490,10 @@ url = st.text_input("Enter a website or IP (e.g., www.google.com, 8.8.8.8):")
 if st.button("Probe (HTTP direct)"):
     if url:
         try:
-            start = datetime.utcnow().timestamp()
-            r = requests.get("http://" + url, timeout=5)
-            latency = (datetime.utcnow().timestamp() - start) * 1000
+            # HEAD: only the status is shown, so don't download the body
+            start = time.perf_counter_ns()
+            r = get_http_session().head("http://" + url, timeout=5, allow_redirects=True)
+            latency = (time.perf_counter_ns() - start) / 1e6
             if latency < 200:
                 st.success(f"🟢 {url} responded in {latency:.2f} ms (HTTP {r.status_code})")
             elif latency < 500:
@@ -335,4 +538,3 @@ st.write("Data source:", "☁️ Cloud API" if PROBE_API_BASE else ("CSV" if use
 if st.button("Refresh data"):
     st.cache_data.clear()
     st.rerun()
-render_globe(nodes=nodes, arcs=arcs, opacity=0.95, auto_rotate_speed=12, show_graticules=True, height=700)
@@ -0,0 +1,72 @@
+# geoip.py
+# GeoIP helpers shared by app.py and globe_component.py
+import os, sqlite3, time
+
+# On-disk GeoIP cache (one table for both modules), so lookups survive restarts
+GEOIP_DB = os.path.join("data", "geoip_cache.db")
+GEOIP_NEGATIVE_TTL_S = 24 * 3600  # "no location" answers are retried after a day
+
+
+def is_ipv4(host):
+    """Dotted-quad check without a regex."""
+    parts = host.split(".")
+    return len(parts) == 4 and all(p.isascii() and p.isdigit() and int(p) < 256 for p in parts)
+
+
+def fetch_ipapi(session, host, timeout=3):
+    """Ask ipapi.co for host -> (answered, coords or None).
+
+    answered is False when the service gave no usable answer (network error, non-2xx,
+    error/rate-limit body); such results must not be cached as "no location".
+    """
+    try:
+        r = session.get(f"https://ipapi.co/{host}/json/", timeout=timeout)
+        r.raise_for_status()
+        j = r.json()
+    except Exception:
+        return False, None
+    if not isinstance(j, dict):
+        return False, None
+    if j.get("error"):
+        # reserved/private ranges are a definite "no location"; anything else (RateLimited, ...) is a failure
+        return bool(j.get("reserved")), None
+    lat = j.get("latitude") or j.get("lat")
+    lng = j.get("longitude") or j.get("lon")
+    if lat and lng:
+        return True, {"lat": float(lat), "lng": float(lng)}
+    return True, None
+
+
+def open_geoip_db(path=GEOIP_DB, **connect_kwargs):
+    """Connect to the GeoIP cache, creating the file and table on first use."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10, **connect_kwargs)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE IF NOT EXISTS geoip (host TEXT PRIMARY KEY, lat REAL, lng REAL, ts INTEGER)")
+    conn.commit()
+    return conn
+
+
+def load_cached(conn, hosts=None):
+    """{host: coords or None} from the cache (all hosts when hosts is None); stale negatives are left out."""
+    cutoff = int(time.time()) - GEOIP_NEGATIVE_TTL_S
+    if hosts is None:
+        rows = conn.execute("SELECT host, lat, lng FROM geoip WHERE lat IS NOT NULL OR ts >= ?", (cutoff,)).fetchall()
+    else:
+        hosts = list(hosts)
+        if not hosts:
+            return {}
+        rows = conn.execute(
+            f"SELECT host, lat, lng FROM geoip WHERE host IN ({','.join('?' * len(hosts))}) AND (lat IS NOT NULL OR ts >= ?)",
+            (*hosts, cutoff)).fetchall()
+    return {h: ({"lat": lat, "lng": lng} if lat is not None else None) for h, lat, lng in rows}
+
+
+def save_cached(conn, entries):
+    """Persist {host: coords or None}; None records a negative answer."""
+    if not entries:
+        return
+    now = int(time.time())
+    conn.executemany("INSERT OR REPLACE INTO geoip (host, lat, lng, ts) VALUES (?,?,?,?)",
+                     [(h, c["lat"] if c else None, c["lng"] if c else None, now) for h, c in entries.items()])
+    conn.commit()
@@ -1,9 +1,10 @@
 # globe_component.py
-import streamlit.components.v1 as components
-import json, random, os, requests, time
-from statistics import mean
+import random, os, requests
 from dateutil import parser as _dt_parser
 
+from globe_widget import render_globe as render_globe_html
+from geoip import is_ipv4, fetch_ipapi, open_geoip_db, load_cached, save_cached
+
 # Optional: runner coordinates (set env vars in deployment for correct location)
 RUNNER_LAT = float(os.getenv("RUNNER_LAT", "37.7749"))   # default SF
 RUNNER_LNG = float(os.getenv("RUNNER_LNG", "-122.4194"))
@@ -18,30 +19,92 @@ HOST_COORDS = {
 }
 
 
-_geoip_cache = {}
+# Cap on hosts drawn: the GLOBE_TOP_K slowest plus the GLOBE_TOP_K most recently seen.
+# Every arc is a three.js draw call, so an uncapped globe degrades as the host list grows.
+GLOBE_TOP_K = int(os.getenv("GLOBE_TOP_K", "50"))
+
+
+# shared session for GeoIP calls
+_SESSION = requests.Session()
+
+
+# in-memory view of the on-disk GeoIP cache (geoip.py); loaded on first lookup, not at import
+_geoip_cache = None
+
+
+def _get_geoip_cache():
+    global _geoip_cache
+    if _geoip_cache is None:
+        try:
+            conn = open_geoip_db()
+            _geoip_cache = load_cached(conn)
+            conn.close()
+        except Exception:
+            _geoip_cache = {}
+    return _geoip_cache
+
+
+def _save_geoip(entries):
+    """Persist {host: coords or None} (best-effort; the in-memory cache is authoritative)."""
+    if not entries:
+        return
+    try:
+        conn = open_geoip_db()
+        save_cached(conn, entries)
+        conn.close()
+    except Exception:
+        pass
+
+
 def try_geoip_lookup(host):
-    """Try free GeoIP service for unknown IPs (cached)."""
-    if host in _geoip_cache:
-        return _geoip_cache[host]
-    import re
-    if re.match(r"^\d+\.\d+\.\d+\.\d+$", host):
+    """Try free GeoIP service for unknown IPs (cached in memory and on disk)."""
+    cache = _get_geoip_cache()
+    if host in cache:
+        return cache[host]
+    if not is_ipv4(host):
+        cache[host] = None
+        return None
+    answered, coords = fetch_ipapi(_SESSION, host)
+    if not answered:
+        # service error/outage: not a "no location" answer, so leave it uncached and retry later
+        return None
+    cache[host] = coords
+    _save_geoip({host: coords})
+    return coords
+
+
+GEOIP_BATCH_URL = "http://ip-api.com/batch"
+GEOIP_BATCH_MAX = 100  # ip-api.com limit per request
+
+
+def prefetch_geoip(hosts):
+    """Resolve all uncached IPv4 hosts with one ip-api.com batch call per 100 hosts."""
+    cache = _get_geoip_cache()
+    unknowns = [h for h in hosts if h not in HOST_COORDS and h not in cache and is_ipv4(h)]
+    for i in range(0, len(unknowns), GEOIP_BATCH_MAX):
+        chunk = unknowns[i:i + GEOIP_BATCH_MAX]
         try:
-            r = requests.get(f"https://ipapi.co/{host}/json/", timeout=3)
-            j = r.json()
-            lat = j.get("latitude")
-            lng = j.get("longitude")
-            if lat and lng:
-                coords = {"lat": float(lat), "lng": float(lng)}
-                _geoip_cache[host] = coords
-                return coords
+            r = _SESSION.post(GEOIP_BATCH_URL, json=[{"query": h, "fields": "status,lat,lon,query"} for h in chunk], timeout=5)
+            r.raise_for_status()
+            resolved = {}
+            for item in r.json():
+                host = item.get("query")
+                if item.get("status") == "success" and item.get("lat") is not None and item.get("lon") is not None:
+                    resolved[host] = {"lat": float(item["lat"]), "lng": float(item["lon"])}
+                elif host:
+                    resolved[host] = None
+            cache.update(resolved)
+            _save_geoip(resolved)
         except Exception:
+            # leave them uncached; try_geoip_lookup() falls back to one call per host
             pass
-    _geoip_cache[host] = None
-    return None
 
 
-def render_globe(df):
-    """Render an interactive globe with points and arcs based on probe data."""
+def render_globe(df, top_k=GLOBE_TOP_K):
+    """Render an interactive globe with points and arcs based on probe data.
+
+    Only the top_k worst-latency and top_k most recent hosts are drawn (None = all).
+    """
     if df.empty:
         return
 
@@ -49,35 +112,43 @@ def render_globe(df):
     if "latency_ms" in df.columns and "avg_ms" not in df.columns:
         df = df.rename(columns={"latency_ms": "avg_ms"})
 
-    # Compute stats per host
-    host_stats = {}
-    grouped = df.groupby("host")
-    for host, g in grouped:
-        latencies = g["avg_ms"].dropna().astype(float).tolist() if "avg_ms" in g else []
-        loss_vals = g.get("packet_loss_pct", g.get("loss_pct"))
-        loss_list = loss_vals.dropna().astype(float).tolist() if loss_vals is not None else []
-        host_stats[host] = {
-            "avg_latency": mean(latencies) if latencies else None,
-            "latest_loss": (loss_list[-1] if loss_list else None),
-            "count": len(g),
-            "last_ts": str(g["timestamp"].max()) if "timestamp" in g.columns else None
-        }
+    # Compute stats per host in one aggregation
+    loss_col = "packet_loss_pct" if "packet_loss_pct" in df.columns else ("loss_pct" if "loss_pct" in df.columns else None)
+    agg_spec = {"count": ("host", "size")}
+    if "avg_ms" in df.columns:
+        agg_spec["avg_latency"] = ("avg_ms", "mean")
+    if loss_col:
+        agg_spec["latest_loss"] = (loss_col, "last")
+    if "timestamp" in df.columns:
+        agg_spec["last_ts"] = ("timestamp", "max")
+    stats_df = df.groupby("host", sort=False, observed=True).agg(**agg_spec)
+    if top_k is not None and len(stats_df) > top_k:
+        keep = stats_df.index[:0]
+        for col in ("avg_latency", "last_ts"):
+            if col in stats_df.columns:
+                keep = keep.union(stats_df[col].sort_values(ascending=False).index[:top_k])
+        stats_df = stats_df.loc[stats_df.index.isin(keep)] if len(keep) else stats_df.head(top_k)
+    if "last_ts" in stats_df.columns:
+        stats_df["last_ts"] = stats_df["last_ts"].astype(str)
+    stats_df = stats_df.reindex(columns=["count", "avg_latency", "latest_loss", "last_ts"])
+    stats_df = stats_df.astype(object).where(stats_df.notna(), None)
 
     # Build nodes
+    prefetch_geoip(stats_df.index)
     nodes = []
     nodes.append({"lat": RUNNER_LAT, "lng": RUNNER_LNG, "size": 1.6, "color": "cyan", "label": "probe-runner"})
-    for host, stats in host_stats.items():
+    for host, count, avg_latency, _, last_ts in stats_df.itertuples(name=None):
         coords = HOST_COORDS.get(host) or try_geoip_lookup(host)
         if coords is None:
             coords = {"lat": (random.random() - 0.5) * 180, "lng": (random.random() - 0.5) * 360}
-        size = 0.6 + min(2.0, 0.02 * (stats["count"] or 1))
-        color = "orange" if stats.get("avg_latency") and stats["avg_latency"] > 300 else ("lime" if stats.get("avg_latency") and stats["avg_latency"] < 50 else "white")
+        size = 0.6 + min(2.0, 0.02 * (count or 1))
+        color = "orange" if avg_latency and avg_latency > 300 else ("lime" if avg_latency and avg_latency < 50 else "white")
         nodes.append({
             "lat": coords["lat"], "lng": coords["lng"], "size": size,
             "color": color, "label": host,
-            "avg_latency": stats.get("avg_latency"),
-            "count": stats.get("count"),
-            "last_ts": stats.get("last_ts")
+            "avg_latency": avg_latency,
+            "count": count,
+            "last_ts": last_ts
         })
 
     # Build arcs from runner to hosts
@@ -95,43 +166,5 @@ def render_globe(df):
             "label": n.get("label"), "latency": latency
         })
 
-    nodes_json = json.dumps(nodes)
-    arcs_json = json.dumps(arcs)
-
-    globe_html = f"""
-    <style>
-      #globeViz {{
-        position: fixed; top: 0; left: 0; width: 100vw; height: 100vh;
-        z-index: -1; opacity: 0.6; pointer-events: none;
-      }}
-      .stApp > .main {{ position: relative; z-index: 1; }}
-    </style>
-    <div id="globeViz"></div>
-    <script src="https://unpkg.com/three@0.159.0/build/three.min.js"></script>
-    <script src="https://unpkg.com/globe.gl"></script>
-    <script>
-    (() => {{
-      const nodes = {nodes_json};
-      const arcs = {arcs_json};
-      const G = Globe()(document.getElementById('globeViz'))
-        .globeImageUrl('//unpkg.com/three-globe/example/img/earth-dark.jpg')
-        .backgroundImageUrl('//unpkg.com/three-globe/example/img/night-sky.png')
-        .showGlobe(true)
-        .showGraticules(false)
-        .pointsData(nodes)
-        .pointAltitude(d => d.size)
-        .pointColor(d => d.color)
-        .pointRadius(0.7)
-        .arcsData(arcs)
-        .arcColor(d => d.color)
-        .arcAltitude(d => d.altitude)
-        .arcStroke(0.7)
-        .arcDashLength(0.6)
-        .arcDashGap(0.4)
-        .arcDashAnimateTime(2000);
-      G.controls().autoRotate = true;
-      G.controls().autoRotateSpeed = 0.8;
-    }})();
-    </script>
-    """
-    components.html(globe_html, height=600)
+    # HTML/JS construction is shared with app.py's globe (globe_widget)
+    render_globe_html(nodes=nodes, arcs=arcs, opacity=0.6, auto_rotate_speed=0.8, show_graticules=False, height=600)
@@ -3,10 +3,18 @@
 # Usage: from globe_widget import render_globe
 #        render_globe(nodes, arcs, opacity=0.55, auto_rotate_speed=0.9, show_graticules=False)
 
+import streamlit as st
 import streamlit.components.v1 as components
 import json
+import os
 import random
 
+# orjson is optional; it serializes the node/arc records natively (numpy scalars included)
+try:
+    import orjson
+except Exception:
+    orjson = None
+
 DEFAULT_CSS = """
 <style>
   /* Full-page globe container behind everything */
@@ -30,6 +38,26 @@ DEFAULT_CSS = """
 </style>
 """
 
+# Textures: served from ./static (Streamlit static serving, see .streamlit/config.toml)
+# so the browser caches them across reruns; unpkg is the fallback if a file is missing.
+TEXTURE_CDN = "https://unpkg.com/three-globe/example/img/"
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+
+def _texture_url(name):
+    if os.path.isfile(os.path.join(STATIC_DIR, name)):
+        # static files live under the app's base path when server.baseUrlPath is set
+        base = (st.get_option("server.baseUrlPath") or "").strip("/")
+        return (f"/{base}" if base else "") + "/app/static/" + name
+    return TEXTURE_CDN + name
+
+GLOBE_IMAGE_URL = _texture_url("earth-night.jpg")
+SKY_IMAGE_URL = _texture_url("night-sky.png")
+
+PRELOAD_LINKS = (
+    f'<link rel="preload" as="image" href="{GLOBE_IMAGE_URL}">'
+    f'<link rel="preload" as="image" href="{SKY_IMAGE_URL}">'
+)
+
 # NOTE: Use token placeholders and do string replace (avoid .format with JS braces).
 SCRIPT_TEMPLATE = """
 <script src="https://unpkg.com/three@0.159.0/build/three.min.js"></script>
@@ -51,8 +79,8 @@ SCRIPT_TEMPLATE = """
     }
 
     const G = Globe()(container)
-      .globeImageUrl('//unpkg.com/three-globe/example/img/earth-night.jpg')
-      .backgroundImageUrl('//unpkg.com/three-globe/example/img/night-sky.png')
+      .globeImageUrl('__GLOBE_IMAGE_URL__')
+      .backgroundImageUrl('__SKY_IMAGE_URL__')
       .showGraticules(showGraticules)
       .pointsData(nodes)
       .pointAltitude(d => d.size || 0.4)
@@ -64,15 +92,11 @@ SCRIPT_TEMPLATE = """
       .arcStroke(0.8)
       .arcDashLength(0.4)
       .arcDashGap(0.2)
+      .arcDashInitialGap(() => Math.random())  // random phase per arc, set once
       .arcDashAnimateTime(1500);
 
     G.controls().autoRotate = true;
     G.controls().autoRotateSpeed = autoRotateSpeed;
-
-    // gentle periodic refresh to animate arcs
-    setInterval(() => {
-      G.arcsData(arcs.map(a => ({ ...a, arcDashInitialGap: Math.random() })));
-    }, 2500);
   }, 350);
 })();
 </script>
@@ -113,6 +137,21 @@ def _coerce_arcs(arcs):
             continue
     return out
 
+def _dumps(records):
+    if orjson is not None:
+        return orjson.dumps(records, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+    return json.dumps(records)
+
+def _build_html(nodes_json, arcs_json, opacity, auto_rotate_speed, show_graticules):
+    css = DEFAULT_CSS.replace("OPACITY_TOKEN", str(opacity))
+    script = SCRIPT_TEMPLATE.replace("__NODES_JSON__", nodes_json)\
+                            .replace("__ARCS_JSON__", arcs_json)\
+                            .replace("__ROTATE_SPEED__", str(auto_rotate_speed))\
+                            .replace("__GRATICULE_TOKEN__", "true" if show_graticules else "false")\
+                            .replace("__GLOBE_IMAGE_URL__", GLOBE_IMAGE_URL)\
+                            .replace("__SKY_IMAGE_URL__", SKY_IMAGE_URL)
+    return PRELOAD_LINKS + css + "<div id='globeViz'></div>" + script
+
 def render_globe(nodes=None, arcs=None, opacity=0.55, auto_rotate_speed=12, show_graticules=False, height=700):
     """
     Render a Globe.gl background in Streamlit.
@@ -124,19 +163,9 @@ def render_globe(nodes=None, arcs=None, opacity=0.55, auto_rotate_speed=12, show
     - show_graticules: boolean
     - height: pixel height for the generated component (recommended >= 600)
     """
-    nodes = _coerce_nodes(nodes)
-    arcs = _coerce_arcs(arcs)
-
-    nodes_json = json.dumps(nodes)
-    arcs_json = json.dumps(arcs)
-
-    css = DEFAULT_CSS.replace("OPACITY_TOKEN", str(opacity))
-    script = SCRIPT_TEMPLATE.replace("__NODES_JSON__", nodes_json)\
-                            .replace("__ARCS_JSON__", arcs_json)\
-                            .replace("__ROTATE_SPEED__", str(auto_rotate_speed))\
-                            .replace("__GRATICULE_TOKEN__", "true" if show_graticules else "false")
-
-    html = css + "<div id='globeViz'></div>" + script
+    nodes_json = _dumps(_coerce_nodes(nodes))
+    arcs_json = _dumps(_coerce_arcs(arcs))
+    html = _build_html(nodes_json, arcs_json, opacity, auto_rotate_speed, show_graticules)
 
     # Use components.html so it sits behind the Streamlit elements
     components.html(html, height=height, scrolling=False)
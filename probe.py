@@ -5,11 +5,14 @@ Real-Time Network Probe
 - Run continuously: python probe.py --interval 1   (interval in minutes)
 """
 
-import subprocess, sys, platform, re, time, argparse, os, json, sqlite3, csv, logging
+import subprocess, sys, platform, re, time, argparse, os, json, sqlite3, csv, logging, atexit
 from datetime import datetime
 from time import perf_counter
 import requests
+from requests.adapters import HTTPAdapter
 import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Try to import push_row helper (optional). If not present, probe still works locally.
 try:
@@ -17,6 +20,14 @@ try:
 except Exception:
     push_row = None
 
+# icmplib pings from an in-process socket (no ping subprocess); optional, falls back to the ping binary
+try:
+    from icmplib import ping as icmp_ping, multiping as icmp_multiping, SocketPermissionError
+    from icmplib import ICMPv4Socket, resolve as icmp_resolve, is_ipv4_address, is_ipv6_address
+except Exception:
+    icmp_ping = icmp_multiping = None
+    SocketPermissionError = None
+
 # Load local .env when present (optional convenience)
 try:
     from dotenv import load_dotenv
@@ -44,6 +55,22 @@ PACKET_LOSS_ALERT_PCT = 20.0
 
 PING_COUNT = 4
 PING_TIMEOUT_MS = 1000  # per-packet timeout for Windows ping -w (ms)
+PING_INTERVAL_S = 0.2  # spacing between echoes to one host when pinging all endpoints at once
+
+# platform and default ping argv are fixed for the process; only the host varies per call
+_IS_WIN = platform.system().lower().startswith("win")
+
+def _ping_argv_prefix(count, timeout_ms):
+    if _IS_WIN:
+        return ("ping", "-n", str(count), "-w", str(timeout_ms))
+    return ("ping", "-c", str(count), "-W", str(int(timeout_ms/1000)))
+
+_PING_ARGV_PREFIX = _ping_argv_prefix(PING_COUNT, PING_TIMEOUT_MS)
+
+# ping output patterns, compiled once
+_RTT_RE = re.compile(r"time[=<]\s*(\d+)\s*ms")  # "time=14ms" or "time<1ms"
+_WIN_SUMMARY_RE = re.compile(r"Packets: Sent = (\d+), Received = (\d+), Lost = (\d+)\s*\((\d+)% loss\)")
+_NIX_SUMMARY_RE = re.compile(r"(\d+)\s+packets transmitted\,\s+(\d+)\s+received\,.*?(\d+\.?\d*)\% packet loss")
 
 # === logging ===
 os.makedirs(DATA_DIR, exist_ok=True)
@@ -54,8 +81,15 @@ console.setLevel(logging.INFO)
 logging.getLogger().addHandler(console)
 
 # === DB helpers ===
+_initialized_dbs = set()  # paths whose schema was already ensured by this process
+
 def init_db(db_path=DB_PATH):
+    """Create tables/index if missing; runs once per path per process (run_once calls it every cycle)."""
+    if db_path in _initialized_dbs:
+        return
     conn = sqlite3.connect(db_path, timeout=30)
+    # WAL is persistent in the DB file: commits append to the log instead of rewriting pages
+    conn.execute("PRAGMA journal_mode=WAL")
     c = conn.cursor()
     c.execute("""
     CREATE TABLE IF NOT EXISTS probes (
@@ -87,40 +121,137 @@ def init_db(db_path=DB_PATH):
         message TEXT
     );
     """)
+    # dashboard reads filter on the time window, then group by host
+    c.execute("CREATE INDEX IF NOT EXISTS idx_probes_ts_host ON probes(timestamp, host)")
     conn.commit()
     conn.close()
+    _initialized_dbs.add(db_path)
 
-# === ping (Windows-friendly parsing) ===
+# === ping ===
 def run_ping(host, count=PING_COUNT, timeout_ms=PING_TIMEOUT_MS):
-    is_win = platform.system().lower().startswith("win")
-    if is_win:
-        cmd = ["ping", "-n", str(count), "-w", str(timeout_ms), host]
-    else:
-        # fallback for other OS
-        cmd = ["ping", "-c", str(count), "-W", str(int(timeout_ms/1000)), host]
-
+    if icmp_ping is not None:
+        try:
+            res = icmp_ping(host, count=count, timeout=timeout_ms/1000.0, privileged=False)
+            return _ping_result_from_icmplib(res)
+        except Exception as e:
+            _icmplib_failed(e)
+            logging.debug(f"icmplib ping failed for {host}, using ping binary: {e}")
+    return _run_ping_subprocess(host, count, timeout_ms)
+
+def ping_all(hosts, count=PING_COUNT, timeout_ms=PING_TIMEOUT_MS):
+    """Ping all hosts concurrently with icmplib.multiping -> {host: result}.
+
+    Hosts missing from the result (icmplib unavailable, name does not resolve, batch
+    failed) are left to run_ping() by the caller.
+    """
+    hosts = list(dict.fromkeys(hosts))
+    if icmp_multiping is None or not hosts or not _icmp_sockets_usable():
+        return {}
+    # multiping fails the whole batch (and leaves its other tasks' errors to the asyncio
+    # logger) when one name doesn't resolve, so resolve up front and leave failures out
+    addrs = {}
+    for host in hosts:
+        if is_ipv4_address(host) or is_ipv6_address(host):
+            addrs[host] = host
+            continue
+        try:
+            addrs[host] = icmp_resolve(host)[0]
+        except Exception as e:
+            logging.debug(f"{host} does not resolve, left out of the ping batch: {e}")
+    if not addrs:
+        return {}
     try:
-        proc = subprocess.run(cmd, capture_output=True, text=True, timeout=(count * (timeout_ms/1000.0) + 5))
-        out = proc.stdout + proc.stderr
+        results = icmp_multiping(list(addrs.values()), count=count, interval=PING_INTERVAL_S,
+                                 timeout=timeout_ms/1000.0, privileged=False)
     except Exception as e:
-        return {"sent": count, "received": 0, "packet_loss_pct": 100.0, "rtts": [], "avg_ms": None, "min_ms": None, "max_ms": None, "raw_output": str(e)}
+        _icmplib_failed(e)
+        logging.debug(f"multiping failed, pinging hosts one by one: {e}")
+        return {}
+    return {host: _ping_result_from_icmplib(res) for host, res in zip(addrs, results)}
+
+_icmp_socket_checked = False
+
+def _icmp_sockets_usable():
+    """Open one unprivileged ICMP socket (once per process) before handing multiping a batch."""
+    global _icmp_socket_checked
+    if not _icmp_socket_checked:
+        _icmp_socket_checked = True
+        try:
+            ICMPv4Socket(privileged=False).close()
+        except Exception as e:
+            _icmplib_failed(e)
+    return icmp_multiping is not None
+
+def _icmplib_failed(e):
+    """Stop trying icmplib for the rest of the process if this OS won't give us ICMP sockets."""
+    global icmp_ping, icmp_multiping
+    if isinstance(e, SocketPermissionError):
+        # unprivileged ICMP sockets disabled (net.ipv4.ping_group_range): use the ping binary
+        logging.info("icmplib: no permission for ICMP sockets, using the ping binary")
+        icmp_ping = icmp_multiping = None
+
+def _ping_result_from_icmplib(res):
+    rtts = list(res.rtts)
+    return {
+        "sent": res.packets_sent,
+        "received": res.packets_received,
+        "packet_loss_pct": float(res.packet_loss * 100.0),
+        "rtts": rtts,
+        "avg_ms": float(res.avg_rtt) if rtts else None,
+        "min_ms": float(res.min_rtt) if rtts else None,
+        "max_ms": float(res.max_rtt) if rtts else None
+    }
 
-    # collect rtt values like: "time=14ms" or "time<1ms"
-    rtt_matches = re.findall(r"time[=<]\s*(\d+)\s*ms", out)
-    rtts = [int(x) for x in rtt_matches] if rtt_matches else []
+# Windows-friendly parsing of the system ping output
+def _run_ping_subprocess(host, count=PING_COUNT, timeout_ms=PING_TIMEOUT_MS):
+    if count == PING_COUNT and timeout_ms == PING_TIMEOUT_MS:
+        cmd = [*_PING_ARGV_PREFIX, host]
+    else:
+        cmd = [*_ping_argv_prefix(count, timeout_ms), host]
 
-    # packets summary (Windows style)
+    try:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1)
+    except Exception as e:
+        logging.debug(f"ping {host} failed to start: {e}")
+        return {"sent": count, "received": 0, "packet_loss_pct": 100.0, "rtts": [], "avg_ms": None, "min_ms": None, "max_ms": None}
+    # hard stop for a hung ping, same budget the blocking call used to have
+    killer = threading.Timer(count * (timeout_ms/1000.0) + 5, proc.kill)
+    killer.start()
+
+    # parse as lines arrive and stop at the summary line instead of waiting for exit
+    debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+    lines = []  # transcript, only kept for the debug log
+    rtts = []
     sent = received = lost = None
     loss_pct = None
-    m = re.search(r"Packets: Sent = (\d+), Received = (\d+), Lost = (\d+)\s*\((\d+)% loss\)", out)
-    if m:
-        sent = int(m.group(1)); received = int(m.group(2)); lost = int(m.group(3)); loss_pct = float(m.group(4))
-    else:
-        # try Linux/other format
-        m2 = re.search(r"(\d+)\s+packets transmitted\,\s+(\d+)\s+received\,.*?(\d+\.?\d*)\% packet loss", out)
-        if m2:
-            sent = int(m2.group(1)); received = int(m2.group(2)); loss_pct = float(m2.group(3))
-            lost = sent - received
+    try:
+        for line in proc.stdout:
+            if debug:
+                lines.append(line)
+            # rtt values like: "time=14ms" or "time<1ms"
+            m = _RTT_RE.search(line)
+            if m:
+                rtts.append(int(m.group(1)))
+                continue
+            # packets summary (Windows style)
+            m = _WIN_SUMMARY_RE.search(line)
+            if m:
+                sent = int(m.group(1)); received = int(m.group(2)); lost = int(m.group(3)); loss_pct = float(m.group(4))
+                break
+            # Linux/other format
+            m2 = _NIX_SUMMARY_RE.search(line)
+            if m2:
+                sent = int(m2.group(1)); received = int(m2.group(2)); loss_pct = float(m2.group(3))
+                lost = sent - received
+                break
+    finally:
+        killer.cancel()
+        if proc.poll() is None:
+            proc.terminate()
+        proc.stdout.close()
+        proc.wait()
+    if debug:
+        logging.debug("".join(lines)[:500])
 
     avg_ms = min_ms = max_ms = None
     if rtts:
@@ -142,11 +273,15 @@ def run_ping(host, count=PING_COUNT, timeout_ms=PING_TIMEOUT_MS):
         "rtts": rtts,
         "avg_ms": avg_ms,
         "min_ms": min_ms,
-        "max_ms": max_ms,
-        "raw_output": out
+        "max_ms": max_ms
     }
 
 # === simple HTTP probe fallback ===
+# keep-alive pool shared by the probe threads: repeat probes skip the TCP/TLS handshake
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=0))
+_SESSION.mount("http://", HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=0))
+
 def run_http(host, timeout_s=3):
     if not host.startswith("http://") and not host.startswith("https://"):
         url = "https://" + host
@@ -154,7 +289,7 @@ def run_http(host, timeout_s=3):
         url = host
     try:
         t0 = perf_counter()
-        r = requests.get(url, timeout=timeout_s)
+        r = _SESSION.get(url, timeout=timeout_s)
         elapsed = (perf_counter() - t0) * 1000.0
         return {"avg_ms": float(elapsed), "http_status": r.status_code, "error": None}
     except Exception as e:
@@ -163,48 +298,182 @@ def run_http(host, timeout_s=3):
 # === write to CSV & DB ===
 CSV_HEADERS = ["timestamp","name","host","method","avg_ms","min_ms","max_ms","rtts","sent","received","packet_loss_pct","http_status","error"]
 
-def append_csv(row, csv_path=CSV_PATH):
-    write_header = not os.path.exists(csv_path)
-    with open(csv_path, "a", newline='', encoding="utf-8") as f:
-        writer = csv.writer(f)
+# the CSV stays open for the life of the process; rows are flushed once per cycle
+_csv_file = None
+_csv_writer = None
+
+def _get_csv_writer(csv_path):
+    global _csv_file, _csv_writer
+    if _csv_file is not None and _csv_file.name != csv_path:
+        close_csv()
+    if _csv_writer is None:
+        write_header = not os.path.exists(csv_path) or os.path.getsize(csv_path) == 0
+        _csv_file = open(csv_path, "a", newline='', encoding="utf-8")
+        _csv_writer = csv.writer(_csv_file)
         if write_header:
-            writer.writerow(CSV_HEADERS)
-        writer.writerow([row.get(h, "") for h in CSV_HEADERS])
+            _csv_writer.writerow(CSV_HEADERS)
+    return _csv_writer
 
-def insert_db(row, db_path=DB_PATH):
-    conn = sqlite3.connect(db_path, timeout=30)
-    c = conn.cursor()
-    c.execute("""INSERT INTO probes (timestamp,name,host,method,avg_ms,min_ms,max_ms,rtts,sent,received,packet_loss_pct,http_status,error)
-                 VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)""",
-              (row['timestamp'], row['name'], row['host'], row['method'], row['avg_ms'], row['min_ms'], row['max_ms'],
-               json.dumps(row['rtts']), row['sent'], row['received'], row['packet_loss_pct'], row.get('http_status'), row.get('error')))
-    conn.commit()
-    conn.close()
+def flush_csv():
+    if _csv_file is not None:
+        _csv_file.flush()
+
+def close_csv():
+    global _csv_file, _csv_writer
+    if _csv_file is not None:
+        _csv_file.close()
+    _csv_file = _csv_writer = None
+
+atexit.register(close_csv)
 
-def insert_alert(alert, db_path=DB_PATH):
+def append_csv(row, csv_path=CSV_PATH):
+    writer = _get_csv_writer(csv_path)
+    # rtts as JSON (same encoding as the DB column) so readers never need eval()
+    writer.writerow([json.dumps(row.get(h) or []) if h == "rtts" else row.get(h, "") for h in CSV_HEADERS])
+
+PROBE_INSERT_SQL = """INSERT INTO probes (timestamp,name,host,method,avg_ms,min_ms,max_ms,rtts,sent,received,packet_loss_pct,http_status,error)
+                      VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)"""
+ALERT_INSERT_SQL = """INSERT INTO alerts (timestamp, name, host, metric, value, threshold, message) VALUES (?,?,?,?,?,?,?)"""
+
+def _connect(db_path):
     conn = sqlite3.connect(db_path, timeout=30)
-    c = conn.cursor()
-    c.execute("""INSERT INTO alerts (timestamp, name, host, metric, value, threshold, message) VALUES (?,?,?,?,?,?,?)""",
-              (alert['timestamp'], alert['name'], alert['host'], alert['metric'], alert['value'], alert['threshold'], alert['message']))
-    conn.commit()
-    conn.close()
+    conn.execute("PRAGMA synchronous=NORMAL")  # per-connection; safe with WAL
+    return conn
+
+def insert_batch(rows, alerts, db_path=DB_PATH):
+    """Insert probe rows and alerts on one connection, in one transaction (both or neither)."""
+    if not rows and not alerts:
+        return
+    conn = _connect(db_path)
+    try:
+        with conn:
+            if rows:
+                conn.executemany(PROBE_INSERT_SQL, [
+                    (row['timestamp'], row['name'], row['host'], row['method'], row['avg_ms'], row['min_ms'], row['max_ms'],
+                     json.dumps(row['rtts']), row['sent'], row['received'], row['packet_loss_pct'], row.get('http_status'), row.get('error'))
+                    for row in rows])
+            if alerts:
+                conn.executemany(ALERT_INSERT_SQL, [
+                    (a['timestamp'], a['name'], a['host'], a['metric'], a['value'], a['threshold'], a['message'])
+                    for a in alerts])
+    finally:
+        conn.close()
+
+def insert_rows(rows, db_path=DB_PATH):
+    """Insert a batch of probe rows with one connection and one commit."""
+    insert_batch(rows, [], db_path)
+
+def insert_alerts(alerts, db_path=DB_PATH):
+    """Insert a batch of alerts with one connection and one commit."""
+    insert_batch([], alerts, db_path)
+
+# === background DB writer ===
+# Probe threads never wait on SQLite: rows and alerts go through a queue to a single
+# writer thread that commits them in batches (up to WRITE_BATCH items or WRITE_WAIT_S).
+WRITE_BATCH = 32
+WRITE_WAIT_S = 2.0
+_write_q = queue.Queue()
+_writer_started = False
+_writer_lock = threading.Lock()
+
+def _writer_loop(db_path):
+    while True:
+        items = [_write_q.get()]
+        deadline = time.monotonic() + WRITE_WAIT_S
+        while len(items) < WRITE_BATCH:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(_write_q.get(timeout=remaining))
+            except queue.Empty:
+                break
+        rows = [item for kind, item in items if kind == "probe"]
+        alerts = [item for kind, item in items if kind == "alert"]
+        try:
+            insert_batch(rows, alerts, db_path)
+        except Exception as e:
+            logging.error(f"DB write failed, dropped {len(rows)} probe rows and {len(alerts)} alerts: {e}")
+        finally:
+            for _ in items:
+                _write_q.task_done()
+
+def queue_write(kind, item):
+    """Hand a 'probe' row or an 'alert' to the background writer for DB_PATH (started on first use)."""
+    global _writer_started
+    with _writer_lock:
+        if not _writer_started:
+            threading.Thread(target=_writer_loop, args=(DB_PATH,), daemon=True).start()
+            _writer_started = True
+    _write_q.put((kind, item))
+
+def flush_writes():
+    """Block until everything queued so far is committed (call before exiting)."""
+    _write_q.join()
 
 # === helper: push to cloud asynchronously ===
+# One daemon thread drains the push queue instead of a new thread per row. push_row()
+# takes a single row, so a drained batch is still pushed row by row.
+PUSH_BATCH = 50
+PUSH_FLUSH_TIMEOUT_S = 10.0  # how long exit waits for queued pushes
+_push_q = queue.Queue()
+_pusher_started = False
+_pusher_lock = threading.Lock()
+
+def _push_loop():
+    while True:
+        batch = [_push_q.get()]
+        try:
+            while len(batch) < PUSH_BATCH:
+                batch.append(_push_q.get_nowait())
+        except queue.Empty:
+            pass
+        pushed = 0
+        for p in batch:
+            try:
+                push_row(p)
+                pushed += 1
+            except Exception as e:
+                logging.debug(f"Cloud push failed (ignored): {e}")
+            finally:
+                _push_q.task_done()
+        if pushed:
+            logging.info(f"Pushed {pushed} row(s) to cloud /ingest")
+
 def push_to_cloud_async(payload):
+    global _pusher_started
     if not push_row:
         # no push helper available
         return
-    def _worker(p):
+    with _pusher_lock:
+        if not _pusher_started:
+            threading.Thread(target=_push_loop, daemon=True).start()
+            _pusher_started = True
+    _push_q.put(payload)
+
+def flush_pushes(timeout_s=PUSH_FLUSH_TIMEOUT_S):
+    """Wait up to timeout_s for queued cloud pushes (call before exiting); the rest are abandoned."""
+    deadline = time.monotonic() + timeout_s
+    with _push_q.all_tasks_done:
+        while _push_q.unfinished_tasks:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            _push_q.all_tasks_done.wait(remaining)
+        # still queued, or in the worker's current batch (dies with the daemon thread)
+        abandoned = _push_q.unfinished_tasks
+    while True:
         try:
-            push_row(p)
-            logging.info("Pushed row to cloud /ingest")
-        except Exception as e:
-            logging.debug(f"Cloud push failed (ignored): {e}")
-    t = threading.Thread(target=_worker, args=(payload,), daemon=True)
-    t.start()
+            _push_q.get_nowait()
+        except queue.Empty:
+            break
+        _push_q.task_done()
+    if abandoned:
+        logging.warning(f"Abandoned {abandoned} unsent cloud push(es) at exit")
 
 # === per-host probe run ===
-def probe_one(endpoint):
+def probe_one(endpoint, ping_result=None):
+    """Probe one endpoint; ping_result is a precomputed run_ping()-style result (see ping_all)."""
     name = endpoint.get("name")
     host = endpoint.get("host")
     prefer = endpoint.get("prefer", "icmp")  # "icmp" or "http"
@@ -217,7 +486,8 @@ def probe_one(endpoint):
 
     # Try ICMP ping unless prefer=http
     if prefer != "http":
-        ping_result = run_ping(host)
+        if ping_result is None:
+            ping_result = run_ping(host)
         row.update({
             "method": "icmp",
             "avg_ms": ping_result.get("avg_ms"),
@@ -248,7 +518,8 @@ def probe_one(endpoint):
             "error": http_result.get("error")
         })
         # still try ping in background to collect packet loss if possible
-        ping_result = run_ping(host)
+        if ping_result is None:
+            ping_result = run_ping(host)
         row['sent'] = ping_result.get("sent")
         row['received'] = ping_result.get("received")
         row['packet_loss_pct'] = ping_result.get("packet_loss_pct")
@@ -260,8 +531,8 @@ def probe_one(endpoint):
 
     return row
 
-# === check alerts ===
-def check_and_record_alerts(row):
+# === check alerts (caller persists them) ===
+def check_alerts(row):
     alerts = []
     ts = row['timestamp']
     if row.get('avg_ms') is not None and row['avg_ms'] > LATENCY_ALERT_MS:
@@ -285,42 +556,54 @@ def check_and_record_alerts(row):
 
     for a in alerts:
         logging.warning(f"ALERT: {a['host']} {a['message']}")
-        insert_alert(a)
     return alerts
 
+# === persist one probe result ===
+def record_row(row):
+    """Write the CSV line, queue the DB writes and the cloud push."""
+    # ensure some types serializable
+    row['rtts'] = row.get('rtts') or []
+    append_csv(row)
+    queue_write("probe", row)
+    for a in check_alerts(row):
+        queue_write("alert", a)
+    logging.info(f"Recorded: host={row['host']} method={row['method']} avg_ms={row['avg_ms']} loss={row['packet_loss_pct']}")
+
+    # Asynchronously push row to cloud (safe - doesn't crash the monitor)
+    try:
+        payload = {
+            "timestamp": row["timestamp"],
+            "name": row["name"],
+            "host": row["host"],
+            "method": row["method"],
+            "avg_ms": row["avg_ms"],
+            "min_ms": row["min_ms"],
+            "max_ms": row["max_ms"],
+            "rtts": row["rtts"],
+            "sent": row["sent"],
+            "received": row["received"],
+            "packet_loss_pct": row["packet_loss_pct"],
+            "http_status": row.get("http_status"),
+            "error": row.get("error")
+        }
+        push_to_cloud_async(payload)
+    except Exception as e:
+        logging.debug("Failed to queue cloud push (ignored): %s", e)
+
 # === run all endpoints and persist ===
 def run_once():
     init_db()
-    for ep in ENDPOINTS:
-        logging.info(f"Probing {ep['name']} ({ep['host']}) ...")
-        row = probe_one(ep)
-        # ensure some types serializable
-        row['rtts'] = row.get('rtts') or []
-        append_csv(row)
-        insert_db(row)
-        check_and_record_alerts(row)
-        logging.info(f"Recorded: host={row['host']} method={row['method']} avg_ms={row['avg_ms']} loss={row['packet_loss_pct']}")
-
-        # Asynchronously push row to cloud (safe - doesn't crash the monitor)
-        try:
-            payload = {
-                "timestamp": row["timestamp"],
-                "name": row["name"],
-                "host": row["host"],
-                "method": row["method"],
-                "avg_ms": row["avg_ms"],
-                "min_ms": row["min_ms"],
-                "max_ms": row["max_ms"],
-                "rtts": row["rtts"],
-                "sent": row["sent"],
-                "received": row["received"],
-                "packet_loss_pct": row["packet_loss_pct"],
-                "http_status": row.get("http_status"),
-                "error": row.get("error")
-            }
-            push_to_cloud_async(payload)
-        except Exception as e:
-            logging.debug("Failed to queue cloud push (ignored): %s", e)
+    # ping icmp endpoints in one batch, then probe all endpoints in parallel;
+    # rows are recorded here as they complete (DB commits happen on the background writer)
+    pings = ping_all([ep['host'] for ep in ENDPOINTS if ep.get('prefer', 'icmp') != 'http'])
+    with ThreadPoolExecutor(max_workers=len(ENDPOINTS)) as ex:
+        futures = {}
+        for ep in ENDPOINTS:
+            logging.info(f"Probing {ep['name']} ({ep['host']}) ...")
+            futures[ex.submit(probe_one, ep, pings.get(ep['host']))] = ep
+        for fut in as_completed(futures):
+            record_row(fut.result())
+    flush_csv()
 
 # === CLI ===
 def main():
@@ -331,6 +614,8 @@ def main():
 
     if args.once:
         run_once()
+        flush_writes()
+        flush_pushes()
         return
 
     logging.info(f"Starting continuous probe (every {args.interval} minute(s)). Ctrl+C to stop.")
@@ -343,6 +628,8 @@ def main():
             time.sleep(sleep_for)
     except KeyboardInterrupt:
         logging.info("Stopping by user request.")
+        flush_writes()
+        flush_pushes()
         sys.exit(0)
 
 if __name__ == "__main__":